@@ -0,0 +1,290 @@
+"""
+SAS Blueprint Analyzer - Token analysis for the SAS QA Translation Tool
+Turns the sas_lexer token stream into the translation blueprint served by /parse.
+"""
+import operator
+import re
+import string
+
+# ====================
+# TOKEN COLUMNS
+# ====================
+# Tokens are split once into parallel start/stop/type-id lists so the analysis
+# loop can index by position instead of building and probing a dict per token.
+_GET = operator.attrgetter('start', 'stop', 'token_type')
+
+# TokenType -> small int id, assigned on first sight and reused across requests
+_TYPE_IDS = {}
+_TYPE_NAMES = []
+
+# Token types that carry no code (whitespace and sas_lexer's comment types)
+_SKIP_TYPE_NAMES = frozenset({'WS', 'COMMENT', 'C_STYLE_COMMENT', 'MACRO_COMMENT', 'PREDICTED_COMMENT_STAT'})
+
+# Quoted literal types (and the text inside "...&macro..." strings): their
+# content is data, not code, so it is replaced by a '' placeholder
+_LITERAL_TYPE_NAMES = frozenset({
+    'STRING_LITERAL', 'STRING_EXPR_TEXT', 'HEX_STRING_LITERAL', 'NAME_LITERAL', 'BIT_TESTING_LITERAL',
+    'DATE_LITERAL', 'DATE_TIME_LITERAL', 'TIME_LITERAL',
+})
+_LITERAL_PLACEHOLDER = "''"
+
+def _token_columns(tokens):
+    """Split lexer tokens into parallel (starts, stops, type_ids) lists."""
+    try:
+        rows = [_GET(token) for token in tokens]
+    except AttributeError:
+        # Rare path: non-Token entries (e.g. Error objects) in the token stream
+        rows = [
+            (getattr(token, 'start', None), getattr(token, 'stop', None), getattr(token, 'token_type', None))
+            for token in tokens
+        ]
+    if not rows:
+        return [], [], []
+
+    starts, stops, token_types = (list(column) for column in zip(*rows))
+    # Only token types never seen before need an id and a name; once the table
+    # is warm this set is empty and no per-type reflection runs at all.
+    for token_type in set(token_types).difference(_TYPE_IDS):
+        name = getattr(token_type, 'name', None)  # TokenType enum member, or a plain string
+        _TYPE_IDS[token_type] = len(_TYPE_NAMES)
+        _TYPE_NAMES.append(str(token_type) if name is None else name)
+    type_ids = list(map(_TYPE_IDS.__getitem__, token_types))
+    return starts, stops, type_ids
+
+# ====================
+# KEYWORD HANDLERS
+# ====================
+# Each handler is called with the index of its keyword token, the per-token
+# text list and the analysis dict, and returns the index the scan should
+# resume from, so a handler can consume several tokens of lookahead without
+# re-dispatching.
+
+# Tokens after DATA that mean it is not a new DATA step
+_DATA_BLOCKLIST = frozenset({'_NULL_', 'STEP', '='})
+
+def _handle_data(i, texts, analysis):
+    """DATA: start of a DATA step (but not DATA _NULL_, DATA STEP, DATA= or DATA(...))."""
+    if not analysis["in_data_step"]:
+        next_text = texts[i+1] if i+1 < len(texts) else ''
+        if next_text and next_text not in _DATA_BLOCKLIST and next_text[0] != '(':
+            analysis["data_steps"] += 1
+            analysis["in_data_step"] = True
+            # ... rest of your DATA step logic ...
+    return i + 1
+
+# PROC detection, macro detection, etc. register here
+_HANDLERS = {
+    'DATA': _handle_data,
+}
+
+# Longer tokens (string literals, long names) are never hashed for the lookup
+_MAX_KEYWORD_LEN = max(map(len, _HANDLERS))
+
+# ASCII-only uppercasing for non-ASCII sources: unlike str.upper() it never
+# changes the string length (e.g. 'ß' -> 'SS'), so token offsets stay valid.
+_ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+# ====================
+# PLATFORM CONCERNS
+# ====================
+# analysis["platform_concerns"] is an int bitmask: detection code ORs in a
+# flag (duplicates are free) and names are produced once for the report.
+_PLATFORM_FLAGS = {
+    'FILENAME_PATH': 1,
+    'X_COMMAND': 2,
+    'SYSEXEC': 4,
+    'LIBNAME_ORACLE': 8,
+    'LIBNAME_TERADATA': 16,
+}
+
+# ====================
+# STATEMENT FLAGS
+# ====================
+# Statement-level features are found with one regex pass over the meaningful
+# token text (uppercased, joined by single spaces, so statements start after
+# "; "). Each named group is either an analysis key set to True or a
+# _PLATFORM_FLAGS name.
+_FLAGS_RE = re.compile(
+    r"(?:^|; )(?:(?P<has_retain>RETAIN)|(?P<has_merge>MERGE)|(?P<has_arrays>ARRAY)"
+    r"|PROC (?P<has_proc_import>IMPORT)"
+    r"|(?P<FILENAME_PATH>FILENAME)|(?P<X_COMMAND>X)(?= ['\"])|(?P<SYSEXEC>%SYSEXEC)"
+    r"|LIBNAME \S+ (?:(?P<LIBNAME_ORACLE>ORACLE)|(?P<LIBNAME_TERADATA>TERADATA)))\b"
+    r"|\b(?P<has_lag>LAG\d*) \("
+)
+
+# ====================
+# BLUEPRINT GENERATION FUNCTION (ADAPTED FOR BACKEND)
+# ====================
+def generate_blueprint(tokens, raw_sas_code):
+    """
+    Analyze SAS tokens to create a translation blueprint.
+    ADAPTED VERSION: Works directly with the Token objects from sas_lexer
+    (read through _token_columns(), no serialization needed).
+    """
+    # Initialize counters and trackers
+    analysis = {
+        "data_steps": 0,
+        "proc_blocks": 0,
+        "proc_sql_blocks": 0,
+        "macro_definitions": 0,
+        "macro_calls": 0,
+        "proc_types": set(),
+        "datasets_created": set(),
+        "datasets_used": set(),
+        "has_retain": False,
+        "has_lag": False,
+        "has_merge": False,
+        "has_arrays": False,
+        "in_data_step": False,
+        "in_proc_block": False,
+        "current_proc": None,
+        "pointer_controls": 0,
+        "line_hold_single": False,
+        "line_hold_double": False,
+        "platform_concerns": 0,  # bitmask of _PLATFORM_FLAGS
+        "has_proc_import": False,
+    }
+    starts, stops, type_ids = _token_columns(tokens)
+    total_tokens = len(type_ids)
+    skip_type_ids = {type_id for type_id, name in enumerate(_TYPE_NAMES) if name in _SKIP_TYPE_NAMES}
+    literal_type_ids = {type_id for type_id, name in enumerate(_TYPE_NAMES) if name in _LITERAL_TYPE_NAMES}
+    
+    # Uppercase the whole source once; keyword text is sliced from this copy
+    # (use raw_sas_code directly wherever the original case matters)
+    if raw_sas_code.isascii():
+        upper_raw = raw_sas_code.upper()
+    else:
+        upper_raw = raw_sas_code.translate(_ASCII_UPPER)
+    
+    # --- TOKEN TEXT ---
+    # Uppercased text of every meaningful token, sliced once and then indexed
+    # by position (tokens without positions get ''). Whitespace and comments
+    # are dropped here, so the loop below never visits them and a handler's
+    # lookahead is simply the next entry. Quoted literals become a '' placeholder
+    # so their contents can never look like a statement.
+    texts = [
+        _LITERAL_PLACEHOLDER if type_id in literal_type_ids
+        else upper_raw[start:stop] if isinstance(start, int) else ''
+        for start, stop, type_id in zip(starts, stops, type_ids)
+        if type_id not in skip_type_ids
+    ]
+    
+    # --- STATEMENT FLAGS ---
+    # RETAIN, LAG(), MERGE, arrays, PROC IMPORT and platform-specific
+    # statements, in a single C-level scan instead of per-token checks
+    for match in _FLAGS_RE.finditer(' '.join(texts)):
+        flag = match.lastgroup
+        if flag in _PLATFORM_FLAGS:
+            analysis["platform_concerns"] |= _PLATFORM_FLAGS[flag]
+        else:
+            analysis[flag] = True
+    
+    # --- KEYWORD PRE-PASS ---
+    # One dict lookup per plausible keyword token; anything longer than the
+    # longest keyword gets no handler.
+    handler_get = _HANDLERS.get
+    handlers = [
+        handler_get(text) if len(text) <= _MAX_KEYWORD_LEN else None
+        for text in texts
+    ]
+    
+    # ========== MAIN PROCESSING LOOP ==========
+    resume = 0
+    for i, handler in enumerate(handlers):
+        # Not a keyword, or already consumed by the previous handler
+        if handler is None or i < resume:
+            continue
+        resume = handler(i, texts, analysis)
+    
+    platform_concerns = sorted(
+        name for name, bit in _PLATFORM_FLAGS.items() if analysis["platform_concerns"] & bit
+    )
+    
+    # --- CALCULATE COMPLEXITY SCORE (your existing code) ---
+    complexity_score = (
+        analysis["data_steps"] * 1 +
+        analysis["proc_blocks"] * 1 +
+        analysis["proc_sql_blocks"] * 2 +
+        analysis["macro_definitions"] * 5 +
+        analysis["macro_calls"] * 2 +
+        (5 if analysis["has_retain"] else 0) +
+        (5 if analysis["has_lag"] else 0) +
+        (3 if analysis["has_merge"] else 0) +
+        (3 if analysis["has_arrays"] else 0) +
+        (analysis["pointer_controls"] * 2) +
+        (10 if analysis["line_hold_double"] else 0) +
+        (8 if analysis["line_hold_single"] else 0) +
+        (len(platform_concerns) * 3) +
+        (10 if analysis["has_proc_import"] else 0)
+    )
+    
+       # --- DETERMINE PRIORITY ---
+    if complexity_score > 25:
+        priority = "High"
+        confidence = "Manual review strongly recommended"
+    elif complexity_score > 15:
+        priority = "Medium"
+        confidence = "Mixed automation with oversight"
+    else:
+        priority = "Low"
+        confidence = "Good candidate for automated translation"
+    
+    # --- GENERATE RECOMMENDATIONS ---
+    recommendations = []
+    if analysis["macro_definitions"] > 0:
+        recommendations.append("Manual review required for custom macro definitions.")
+    if analysis["proc_sql_blocks"] > 0:
+        recommendations.append(f"Verify logic of {analysis['proc_sql_blocks']} PROC SQL block(s).")
+    if analysis["has_retain"]:
+        recommendations.append("RETAIN statements require stateful translation logic.")
+    if analysis["has_lag"]:
+        recommendations.append("LAG functions need special handling for row context.")
+    if analysis["pointer_controls"] > 0:
+        recommendations.append(f"Column pointer controls (@) detected: {analysis['pointer_controls']} instance(s). Requires careful input parsing translation.")
+    if analysis["line_hold_single"]:
+        recommendations.append("Single trailing @ detected: Line hold requires stateful INPUT buffer management.")
+    if analysis["line_hold_double"]:
+        recommendations.append("Double trailing @@ detected: Complex line hold across multiple records.")
+    if platform_concerns:
+        concerns_text = ", ".join(platform_concerns)
+        recommendations.append(f"Platform-specific code: {concerns_text}. Review for portability.")
+    if analysis["has_proc_import"]:
+        recommendations.append("PROC IMPORT detected: Requires manual mapping to pandas.read_csv()/read_excel() with specific parameter analysis.")
+    if not recommendations:
+        recommendations.append("Code structure appears straightforward for automated translation.")
+
+    # --- STRUCTURE FINAL BLUEPRINT ---
+    blueprint = {
+        "summary": {
+            "translation_priority": priority,
+            "confidence_assessment": confidence,
+            "complexity_score": complexity_score,
+            "total_lines": len(raw_sas_code.split('\n')),
+            "total_tokens": total_tokens
+        },
+        "detailed_counts": {
+            "DATA Steps": analysis["data_steps"],
+            "PROC Blocks": analysis["proc_blocks"],
+            "PROC SQL Blocks": analysis["proc_sql_blocks"],
+            "Macro Definitions": analysis["macro_definitions"],
+            "Macro Calls": analysis["macro_calls"],
+            "PROC Types Found": list(sorted(analysis["proc_types"]))
+        },
+        "data_flow": {
+            "datasets_created": list(sorted(analysis["datasets_created"])),
+            "datasets_used": list(sorted(analysis["datasets_used"]))
+        },
+        "complexity_flags": {
+            "has_retain_statement": analysis["has_retain"],
+            "has_lag_function": analysis["has_lag"],
+            "has_merge_statement": analysis["has_merge"],
+            "has_array_declarations": analysis["has_arrays"],
+            "pointer_controls_count": analysis["pointer_controls"],
+            "has_line_hold_single": analysis["line_hold_single"],
+            "has_line_hold_double": analysis["line_hold_double"],
+            "platform_concerns": platform_concerns
+        },
+        "recommendations": recommendations
+    }
+    
+    return blueprint
@@ -2,18 +2,46 @@
 SAS Parser API - Backend for the SAS QA Translation Tool
 This is the FastAPI application that provides the parsing endpoint.
 """
+import asyncio
+import hashlib
+import operator
+import os
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import sas_lexer  # This is the critical Rust-based parser
 
+from blueprint import generate_blueprint
+
 # Initialize the FastAPI application
 app = FastAPI(
     title="SAS Parser API",
     description="API for lexing and analyzing SAS code. Powers the SAS QA Translation Frontend.",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson encodes the (potentially huge) token list several times faster
+    # than the default json.dumps path. The parse endpoints also return the
+    # response object themselves, which skips FastAPI's jsonable_encoder walk.
+    default_response_class=ORJSONResponse,
 )
 
+# --- Worker Pool ---
+# Lexing and analysis are CPU-bound; running them in worker processes keeps the
+# event loop free and spreads concurrent requests across cores (threads would
+# serialize on the GIL).
+_POOL_WORKERS = os.cpu_count() or 1  # cpu_count() may be None
+_POOL = ProcessPoolExecutor(max_workers=_POOL_WORKERS)
+
+@app.on_event("shutdown")
+def _shutdown_pool():
+    """Stop the worker processes with the application."""
+    _POOL.shutdown(cancel_futures=True)
+
 # --- CORS Configuration ---
 app.add_middleware(
     CORSMiddleware,
@@ -23,231 +51,141 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Data Model ---
-class SASCode(BaseModel):
-    """Pydantic model for the incoming SAS code string."""
-    code: str
+# --- Compression ---
+# Responses are gzipped by Starlette. Request bodies are not decompressed by
+# Starlette/uvicorn, so gzip-encoded uploads are inflated here before routing.
+# Both the compressed body and what it inflates to are capped, so a small
+# upload cannot expand into gigabytes (decompression bomb).
+_MAX_GZIP_BODY = 16 * 1024 * 1024
+_MAX_INFLATED_BODY = 128 * 1024 * 1024
 
-# ====================
-# BLUEPRINT GENERATION FUNCTION (ADAPTED FOR BACKEND)
-# ====================
-def generate_blueprint(serializable_tokens, raw_sas_code):
-    """
-    Analyze SAS tokens to create a translation blueprint.
-    ADAPTED VERSION: Works with serialized token dictionaries from sas_lexer.
-    """
-    # Initialize counters and trackers
-    analysis = {
-        "data_steps": 0,
-        "proc_blocks": 0,
-        "proc_sql_blocks": 0,
-        "macro_definitions": 0,
-        "macro_calls": 0,
-        "proc_types": set(),
-        "datasets_created": set(),
-        "datasets_used": set(),
-        "has_retain": False,
-        "has_lag": False,
-        "has_merge": False,
-        "has_arrays": False,
-        "in_data_step": False,
-        "in_proc_block": False,
-        "current_proc": None,
-        "pointer_controls": 0,
-        "line_hold_single": False,
-        "line_hold_double": False,
-        "platform_concerns": [],
-        "has_proc_import": False,
-    }
+class GzipRequestMiddleware:
+    """ASGI middleware that decompresses request bodies sent with Content-Encoding: gzip."""
+    def __init__(self, app):
+        self.app = app
     
-    # Helper: Safe token text extraction (WORKS WITH DICTIONARIES)
-    def get_token_text_safe(token_idx):
-        if token_idx >= len(serializable_tokens) or token_idx < 0:
-            return None
-        token = serializable_tokens[token_idx]
-        start = token.get('start')
-        stop = token.get('stop')
-        if start is not None and stop is not None and isinstance(start, int) and isinstance(stop, int):
-            return raw_sas_code[start:stop].upper()
-        return token.get('text', '').upper()
-    
-    # Helper: Safe token type check (WORKS WITH DICTIONARIES)
-    def get_token_type_safe(token_idx):
-        if token_idx >= len(serializable_tokens) or token_idx < 0:
-            return None
-        token = serializable_tokens[token_idx]
-        token_type = token.get('token_type')
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = dict(scope["headers"]).get(b"content-encoding", b"")
+        if encoding.strip().lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
         
-        # Convert TokenType object to string if needed
-        if token_type is None:
-            return None
-        elif hasattr(token_type, 'name'):  # It's a TokenType object
-            return token_type.name
-        else:  # It's already a string
-            return str(token_type)
-    
-    # ========== MAIN PROCESSING LOOP ==========
-    i = 0
-    while i < len(serializable_tokens):
-        token_text = get_token_text_safe(i)
-        token_type = get_token_type_safe(i)
+        async def reject(status_code, message):
+            await PlainTextResponse(message, status_code=status_code)(scope, receive, send)
         
-        # Skip if no text
-        if not token_text:
-            i += 1
-            continue
+        # Inflate chunk by chunk as the body arrives, never past the caps
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        received = 0
+        inflated = 0
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body_chunk = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                received += len(body_chunk)
+                if received > _MAX_GZIP_BODY:
+                    await reject(413, "Compressed request body too large")
+                    return
+                data = decompressor.decompress(body_chunk, _MAX_INFLATED_BODY - inflated + 1)
+                inflated += len(data)
+                if inflated > _MAX_INFLATED_BODY:
+                    await reject(413, "Decompressed request body too large")
+                    return
+                chunks.append(data)
+        except zlib.error:
+            await reject(400, "Invalid gzip request body")
+            return
+        if not decompressor.eof:
+            await reject(400, "Invalid gzip request body")
+            return
+        body = b"".join(chunks)
         
-        # --- SKIP WHITESPACE AND COMMENTS ---
-        # token_type is now a STRING (e.g., 'WS', 'COMMENT', 'KW_DATA')
-        if token_type and (token_type == 'WS' or token_type == 'COMMENT'):
-            i += 1
-            continue
-        # =====================================
+        # Downstream sees a plain, uncompressed request
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        headers.append((b"content-length", str(len(body)).encode()))
+        body_sent = False
         
-        # --- YOUR ORIGINAL ANALYSIS LOGIC GOES HERE ---
-        # (Keep all your detection logic for DATA, PROC, etc.)
-        # Example: DATA step detection
-        if token_text == 'DATA' and not analysis["in_data_step"]:
-            next_text = get_token_text_safe(i+1)
-            if next_text and next_text not in ['_NULL_', 'STEP', '='] and not next_text.startswith('('):
-                analysis["data_steps"] += 1
-                analysis["in_data_step"] = True
-                # ... rest of your DATA step logic ...
+        async def receive_inflated():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
         
-        # PROC detection, macro detection, etc.
-        # ...
-        # ==============================================
-        
-        # INCREMENT INDEX (for all non-skipped tokens)
-        i += 1
-    
-    # --- CALCULATE COMPLEXITY SCORE (your existing code) ---
-    complexity_score = (
-        analysis["data_steps"] * 1 +
-        analysis["proc_blocks"] * 1 +
-        analysis["proc_sql_blocks"] * 2 +
-        analysis["macro_definitions"] * 5 +
-        analysis["macro_calls"] * 2 +
-        (5 if analysis["has_retain"] else 0) +
-        (5 if analysis["has_lag"] else 0) +
-        (3 if analysis["has_merge"] else 0) +
-        (3 if analysis["has_arrays"] else 0) +
-        (analysis["pointer_controls"] * 2) +
-        (10 if analysis["line_hold_double"] else 0) +
-        (8 if analysis["line_hold_single"] else 0) +
-        (len(analysis["platform_concerns"]) * 3) +
-        (10 if analysis["has_proc_import"] else 0)
-    )
-    
-       # --- DETERMINE PRIORITY ---
-    if complexity_score > 25:
-        priority = "High"
-        confidence = "Manual review strongly recommended"
-    elif complexity_score > 15:
-        priority = "Medium"
-        confidence = "Mixed automation with oversight"
-    else:
-        priority = "Low"
-        confidence = "Good candidate for automated translation"
-    
-    # --- GENERATE RECOMMENDATIONS ---
-    recommendations = []
-    if analysis["macro_definitions"] > 0:
-        recommendations.append("Manual review required for custom macro definitions.")
-    if analysis["proc_sql_blocks"] > 0:
-        recommendations.append(f"Verify logic of {analysis['proc_sql_blocks']} PROC SQL block(s).")
-    if analysis["has_retain"]:
-        recommendations.append("RETAIN statements require stateful translation logic.")
-    if analysis["has_lag"]:
-        recommendations.append("LAG functions need special handling for row context.")
-    if analysis["pointer_controls"] > 0:
-        recommendations.append(f"Column pointer controls (@) detected: {analysis['pointer_controls']} instance(s). Requires careful input parsing translation.")
-    if analysis["line_hold_single"]:
-        recommendations.append("Single trailing @ detected: Line hold requires stateful INPUT buffer management.")
-    if analysis["line_hold_double"]:
-        recommendations.append("Double trailing @@ detected: Complex line hold across multiple records.")
-    if analysis["platform_concerns"]:
-        unique_concerns = list(set(analysis["platform_concerns"]))
-        concerns_text = ", ".join(sorted(unique_concerns))
-        recommendations.append(f"Platform-specific code: {concerns_text}. Review for portability.")
-    if analysis["has_proc_import"]:
-        recommendations.append("PROC IMPORT detected: Requires manual mapping to pandas.read_csv()/read_excel() with specific parameter analysis.")
-    if not recommendations:
-        recommendations.append("Code structure appears straightforward for automated translation.")
+        await self.app(dict(scope, headers=headers), receive_inflated, send)
+
+app.add_middleware(GzipRequestMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# --- Data Model ---
+class SASCode(BaseModel):
+    """Pydantic model for the incoming SAS code string."""
+    code: str
+    name: str | None = None
 
-    # --- STRUCTURE FINAL BLUEPRINT ---
-    blueprint = {
-        "summary": {
-            "translation_priority": priority,
-            "confidence_assessment": confidence,
-            "complexity_score": complexity_score,
-            "total_lines": len(raw_sas_code.split('\n')),
-            "total_tokens": len(serializable_tokens)
-        },
-        "detailed_counts": {
-            "DATA Steps": analysis["data_steps"],
-            "PROC Blocks": analysis["proc_blocks"],
-            "PROC SQL Blocks": analysis["proc_sql_blocks"],
-            "Macro Definitions": analysis["macro_definitions"],
-            "Macro Calls": analysis["macro_calls"],
-            "PROC Types Found": list(sorted(analysis["proc_types"]))
-        },
-        "data_flow": {
-            "datasets_created": list(sorted(analysis["datasets_created"])),
-            "datasets_used": list(sorted(analysis["datasets_used"]))
-        },
-        "complexity_flags": {
-            "has_retain_statement": analysis["has_retain"],
-            "has_lag_function": analysis["has_lag"],
-            "has_merge_statement": analysis["has_merge"],
-            "has_array_declarations": analysis["has_arrays"],
-            "pointer_controls_count": analysis["pointer_controls"],
-            "has_line_hold_single": analysis["line_hold_single"],
-            "has_line_hold_double": analysis["line_hold_double"],
-            "platform_concerns": analysis["platform_concerns"]
-        },
-        "recommendations": recommendations
-    }
+class SASBatch(BaseModel):
+    """Pydantic model for several SAS files analyzed in one request."""
+    files: list[SASCode]
+
+# --- Parsing (runs in the worker pool) ---
+# sas_lexer Tokens (no __dict__) are sent as compact [start, stop, token_type]
+# rows rather than dicts: far less memory per token and no repr() per token
+_TOKEN_ROW = operator.attrgetter('start', 'stop', 'token_type')
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+def _serialize_via_vars(token):
+    """Token with a __dict__: its scalar attributes as a dict."""
+    return {k: v for k, v in vars(token).items() if isinstance(v, _SCALAR_TYPES)}
+
+def _serialize_token(token):
+    """Serialize any single entry of the token stream (slow path, decides per entry)."""
+    if hasattr(token, '__dict__'):
+        return _serialize_via_vars(token)
+    if hasattr(token, 'message'):  # Likely an Error object
+        return {
+            "type": "error",
+            "message": str(getattr(token, 'message', 'Unknown error')),
+            "repr": repr(token)
+        }
+    return _TOKEN_ROW(token)
+
+def _serialize_tokens(tokens):
+    """Convert complex Token objects AND Error objects to serializable format."""
+    if not hasattr(tokens, '__iter__'):
+        return str(tokens)
+    if not tokens:
+        return []
     
-    return blueprint
-# --- API Endpoints ---
-@app.post("/parse")
-def parse_sas(sas_input: SASCode):
+    # All tokens come from the same lexer, so the serializer is picked once
+    # from the first one instead of trying vars() (and catching TypeError)
+    # on every token
+    serializer = _serialize_via_vars if hasattr(tokens[0], '__dict__') else _TOKEN_ROW
+    try:
+        return list(map(serializer, tokens))
+    except (TypeError, AttributeError):
+        # Mixed stream (e.g. Error objects among the tokens)
+        return [_serialize_token(token) for token in tokens]
+
+def _do_parse(code, include_tokens=True):
     """
-    Main parsing endpoint.
-    Accepts a JSON object with a 'code' field containing the SAS code.
-    Returns the lexed tokens, any errors, and the full analysis blueprint.
+    Lex and analyze one SAS program.
+    Module-level so it can be pickled and sent to the worker pool.
+    Returns the JSON-ready response dict for /parse; the token list is only
+    serialized when include_tokens is set.
     """
     try:
         # 1. Call the lexer (this part works)
-        tokens, errors, _ = sas_lexer.lex_program_from_str(sas_input.code)
+        tokens, errors, _ = sas_lexer.lex_program_from_str(code)
         
-        # 2. Convert complex Token objects AND Error objects to serializable format
-        serializable_tokens = []
-        if hasattr(tokens, '__iter__'):
-            for token in tokens:
-                try:
-                    token_dict = vars(token)
-                    filtered_dict = {k: v for k, v in token_dict.items() if isinstance(v, (str, int, float, bool, type(None)))}
-                    serializable_tokens.append(filtered_dict)
-                except TypeError:
-                    # Handle Error objects specifically
-                    if hasattr(token, 'message'):  # Likely an Error object
-                        serializable_tokens.append({
-                            "type": "error",
-                            "message": str(getattr(token, 'message', 'Unknown error')),
-                            "repr": repr(token)
-                        })
-                    else:
-                        serializable_tokens.append({
-                            "repr": repr(token),
-                            "text": getattr(token, 'text', 'N/A'),
-                            "start": getattr(token, 'start', 'N/A'),
-                            "stop": getattr(token, 'stop', 'N/A'),
-                            "token_type": getattr(token, 'token_type', 'N/A')
-                        })
-        else:
-            serializable_tokens = str(tokens)
+        # 2. Generate the blueprint straight from the native Token objects
+        blueprint = generate_blueprint(tokens, code)
         
         # 3. ALSO serialize any Error objects in the errors list
         serializable_errors = []
@@ -261,16 +199,13 @@ def parse_sas(sas_input: SASCode):
             else:
                 serializable_errors.append(str(err))  # Fallback
 
-        # 4. Generate the blueprint
-        blueprint = generate_blueprint(serializable_tokens, sas_input.code)
-        
-        # 5. Return everything
-        return {
-            "success": True,
-            "tokens": serializable_tokens,
-            "errors": serializable_errors,  # CRITICAL: Use the serialized version
-            "blueprint": blueprint
-        }
+        # 4. Return everything (tokens only if the client asked for them)
+        result = {"success": True}
+        if include_tokens:
+            result["tokens"] = _serialize_tokens(tokens)
+        result["errors"] = serializable_errors  # CRITICAL: Use the serialized version
+        result["blueprint"] = blueprint
+        return result
     
     except Exception as e:
         return {
@@ -278,6 +213,76 @@ def parse_sas(sas_input: SASCode):
             "error": f"Parsing failed: {str(e)}"
         }
 
+# --- Startup Warm-up ---
+# Small program touching the main code paths (DATA step, PROC SQL, flags)
+_WARMUP_SAS = "data a; set b; retain x; run;\nproc sql; select * from a; quit;\n"
+
+@app.on_event("startup")
+async def _warmup():
+    """
+    Lex and analyze a small program before serving, so the first real request
+    doesn't pay for cold lexer/analysis state or for starting the worker pool.
+    """
+    # Warm this process first: workers forked afterwards inherit its state
+    _do_parse(_WARMUP_SAS)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[
+        loop.run_in_executor(_POOL, _do_parse, _WARMUP_SAS) for _ in range(_POOL_WORKERS)
+    ])
+
+# --- Result Cache ---
+# Re-analyzing an unchanged upload (repeat clicks, re-uploads) is served from an
+# LRU cache keyed by a hash of the code. Only token-less results (blueprint and
+# errors, a few KB each) are cached: a token list grows with the file and 64
+# of them could pin gigabytes. Only touched from the event loop, so no lock is
+# needed.
+_CACHE_SIZE = 64
+_cache = OrderedDict()
+
+async def _parse_cached(code, include_tokens=True):
+    """Return the _do_parse() result for this code, reusing a cached one if present."""
+    loop = asyncio.get_running_loop()
+    if include_tokens:
+        return await loop.run_in_executor(_POOL, _do_parse, code, True)
+    
+    key = hashlib.blake2b(code.encode(), digest_size=16).digest()
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+        return result
+    
+    result = await loop.run_in_executor(_POOL, _do_parse, code, False)
+    _cache[key] = result
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+# --- API Endpoints ---
+@app.post("/parse")
+async def parse_sas(sas_input: SASCode, tokens: bool = True):
+    """
+    Main parsing endpoint.
+    Accepts a JSON object with a 'code' field containing the SAS code.
+    Returns the lexed tokens, any errors, and the full analysis blueprint.
+    Each token is a [start, stop, token_type] row.
+    Pass ?tokens=false to leave the (large) token list out of the response.
+    """
+    return ORJSONResponse(await _parse_cached(sas_input.code, tokens))
+
+@app.post("/parse_batch")
+async def parse_sas_batch(batch: SASBatch, tokens: bool = True):
+    """
+    Batch parsing endpoint.
+    Accepts {"files": [{"name": ..., "code": ...}, ...]} and analyzes all files
+    concurrently in the worker pool.
+    Returns one /parse-style result per file (plus its name), in input order.
+    Supports the same ?tokens=false switch as /parse.
+    """
+    results = await asyncio.gather(*[_parse_cached(sas_file.code, tokens) for sas_file in batch.files])
+    return ORJSONResponse([
+        {"name": sas_file.name, **result} for sas_file, result in zip(batch.files, results)
+    ])
+
 @app.get("/")
 def read_root():
     """Simple health check endpoint."""
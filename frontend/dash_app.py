@@ -2,6 +2,8 @@ import dash
 from dash import dcc, html, Input, Output, State, callback
 import dash_auth
 import base64
+import gzip
+import json
 import requests
 
 # Authentication
@@ -18,13 +20,13 @@ app.layout = html.Div([
         html.H3("📁 Stage 1: Upload & Analyze"),
         dcc.Upload(
             id='upload-sas',
-            children=html.Div(['Drag and Drop or ', html.A('Select a SAS File (.sas)')]),
+            children=html.Div(['Drag and Drop or ', html.A('Select SAS Files (.sas)')]),
             style={
                 'width': '100%', 'height': '60px', 'lineHeight': '60px',
                 'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px',
                 'textAlign': 'center', 'margin': '10px'
             },
-            multiple=False
+            multiple=True
         ),
         html.Button('🔍 Generate Analysis Blueprint', id='analyze-button', n_clicks=0,
                    style={'margin': '10px', 'padding': '10px'}),
@@ -41,22 +43,51 @@ app.layout = html.Div([
     dcc.Store(id='stored-file-content'),
 ])
 
-# Callback 1: Store uploaded file
+# Callback 1: Store uploaded files
 @callback(
     Output('output-file-name', 'children'),
     Output('stored-file-content', 'data'),
     Input('upload-sas', 'contents'),
     State('upload-sas', 'filename')
 )
-def store_uploaded_file(contents, filename):
+def store_uploaded_file(contents, filenames):
     if contents is not None:
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        sas_code = decoded.decode('utf-8')
-        return f"📄 File loaded: {filename}", {'filename': filename, 'code': sas_code}
+        files = []
+        for content, filename in zip(contents, filenames):
+            content_type, content_string = content.split(',')
+            decoded = base64.b64decode(content_string)
+            files.append({'filename': filename, 'code': decoded.decode('utf-8')})
+        return f"📄 Files loaded: {', '.join(filenames)}", {'files': files}
     return "No file uploaded.", None
 
-# Callback 2: Generate blueprint
+# Helper: Render one file's /parse_batch result
+def render_result(filename, data):
+    if not data.get("success"):
+        return html.P(f"❌ Backend error ({filename}): {data.get('error', 'Unknown')}")
+    if 'blueprint' not in data:
+        # Fallback if no blueprint
+        return html.P(f"✅ Parsed {filename}. Errors: {len(data.get('errors', []))}")
+    
+    bp = data['blueprint']
+    return html.Div([
+        html.H4(f"✅ Analysis Complete: {filename}"),
+        html.P(f"🏷️ Translation Priority: {bp['summary']['translation_priority']}"),
+        html.P(f"🧮 Complexity Score: {bp['summary']['complexity_score']}"),
+        html.P(f"📈 Total Lines: {bp['summary']['total_lines']}"),
+        html.Hr(),
+        html.H5("🔍 Detailed Counts"),
+        html.P(f"📝 DATA Steps: {bp['detailed_counts']['DATA Steps']}"),
+        html.P(f"⚙️ PROC Blocks: {bp['detailed_counts']['PROC Blocks']}"),
+        html.P(f"🗃️ PROC SQL Blocks: {bp['detailed_counts']['PROC SQL Blocks']}"),
+        html.Hr(),
+        html.H5("💡 Recommendations"),
+        html.Ul([html.Li(rec) for rec in bp['recommendations']]),
+        html.Hr(),
+        html.P(f"Tokens Found: {bp['summary']['total_tokens']}"),
+        html.P(f"Errors Found: {len(data.get('errors', []))}")
+    ])
+
+# Callback 2: Generate blueprints (all uploaded files in one request)
 @callback(
     Output('blueprint-output', 'children'),
     Output('results-section', 'style'),
@@ -68,47 +99,25 @@ def generate_blueprint(n_clicks, file_data):
     if file_data is None:
         return "❌ Please upload a file first.", {'display': 'block'}
     
-    API_URL = "http://localhost:8000/parse"
+    API_URL = "http://localhost:8000/parse_batch"
+    results_style = {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
     
     try:
-        response = requests.post(API_URL, json={"code": file_data['code']})
+        files = [{"name": f['filename'], "code": f['code']} for f in file_data['files']]
+        # SAS sources compress well: send the body gzipped (requests already
+        # asks for and transparently inflates gzipped responses).
+        body = gzip.compress(json.dumps({"files": files}).encode('utf-8'))
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        # Tokens are not displayed, so ask the backend not to send them
+        response = requests.post(API_URL, params={"tokens": "false"}, data=body, headers=headers)
         
         if response.status_code == 200:
-            data = response.json()
-            
-            if data.get("success"):
-                # Check for blueprint data
-                if 'blueprint' in data:
-                    bp = data['blueprint']
-                    
-                    # Build the display
-                    display = html.Div([
-                        html.H4(f"✅ Analysis Complete: {file_data['filename']}"),
-                        html.P(f"🏷️ Translation Priority: {bp['summary']['translation_priority']}"),
-                        html.P(f"🧮 Complexity Score: {bp['summary']['complexity_score']}"),
-                        html.P(f"📈 Total Lines: {bp['summary']['total_lines']}"),
-                        html.Hr(),
-                        html.H5("🔍 Detailed Counts"),
-                        html.P(f"📝 DATA Steps: {bp['detailed_counts']['DATA Steps']}"),
-                        html.P(f"⚙️ PROC Blocks: {bp['detailed_counts']['PROC Blocks']}"),
-                        html.P(f"🗃️ PROC SQL Blocks: {bp['detailed_counts']['PROC SQL Blocks']}"),
-                        html.Hr(),
-                        html.H5("💡 Recommendations"),
-                        html.Ul([html.Li(rec) for rec in bp['recommendations']]),
-                        html.Hr(),
-                        html.P(f"Tokens Found: {len(data.get('tokens', []))}"),
-                        html.P(f"Errors Found: {len(data.get('errors', []))}")
-                    ])
-                    return display, {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
-                else:
-                    # Fallback if no blueprint
-                    return f"✅ Parsed. Tokens: {len(data.get('tokens', []))}, Errors: {len(data.get('errors', []))}", {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
-            else:
-                return f"❌ Backend error: {data.get('error', 'Unknown')}", {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
+            display = html.Div([render_result(result['name'], result) for result in response.json()])
+            return display, results_style
         else:
-            return f"❌ HTTP error: {response.status_code}", {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
+            return f"❌ HTTP error: {response.status_code}", results_style
     except Exception as e:
-        return f"⚠️ Connection error: {e}", {'padding': '20px', 'border': '1px solid #ddd', 'margin': '20px', 'display': 'block'}
+        return f"⚠️ Connection error: {e}", results_style
 
 if __name__ == '__main__':
     app.run(debug=True, port=8050)
\ No newline at end of file